@@ -5,24 +5,42 @@ import numpy as np
 import re
 from paddleocr import PaddleOCR
 
-def extract_card_info(image_path):
+def create_ocr():
+    """Initialize PaddleOCR (slow, so reuse the instance across images)"""
+    return PaddleOCR(use_angle_cls=True, lang='en')
+
+def extract_card_info(image_path, ocr=None):
     """
     Extract card name and set number using region-specific OCR
     
     Args:
         image_path: Path to the card image
+        ocr: PaddleOCR instance to reuse (optional)
     
     Returns:
         Dictionary with card name and set number
     """
-    # Initialize PaddleOCR
-    ocr = PaddleOCR(use_angle_cls=True, lang='en')
-    
     # Read the image
     img = cv2.imread(image_path)
     if img is None:
         raise ValueError(f"Could not read image at {image_path}")
     
+    return extract_from_image(img, ocr)
+
+def extract_from_image(img, ocr=None):
+    """
+    Extract card name and set number from an already decoded image
+    
+    Args:
+        img: BGR image array as returned by cv2.imread
+        ocr: PaddleOCR instance to reuse (optional)
+    
+    Returns:
+        Dictionary with card name and set number
+    """
+    if ocr is None:
+        ocr = create_ocr()
+    
     height, width, _ = img.shape
     
     # Define regions of interest (ROI)
@@ -137,6 +155,8 @@ def process_batch(directory, output_file=None):
         with open(output_file, 'w') as f:
             f.write("Image,Card Name,Set Number\n")
     
+    ocr = create_ocr()
+    
     # Get all image files in the directory
     for filename in os.listdir(directory):
         file_ext = os.path.splitext(filename)[1].lower()
@@ -145,7 +165,7 @@ def process_batch(directory, output_file=None):
             
             try:
                 print(f"Processing {filename}...")
-                card_info = extract_card_info(image_path)
+                card_info = extract_card_info(image_path, ocr)
                 
                 # Print result to console
                 print(f"  Card Name: {card_info['card_name']}")
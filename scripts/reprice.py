@@ -0,0 +1,281 @@
+import json
+import time
+import argparse
+import datetime
+import numpy as np
+import pandas as pd
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine, text
+from snapshot import CATALOG_COLUMNS, load_catalog, read_export
+
+# Database connection parameters
+DB_USER = 'postgres'
+DB_PASSWORD = 'postgres'
+DB_HOST = 'localhost'
+DB_PORT = '5432'
+DB_NAME = 'card_database'
+
+TABLE_NAME = 'one_piece_cards'
+
+# Listing price = max(market * market_multiplier, floor column + floor_offset, minimum),
+# capped at market * max_market_multiplier (null for no cap), then rounded to round_to.
+# Cards with neither a market nor a floor price are left unpriced.
+# Entries under "rarity" override the defaults for that rarity.
+# The floor is the bare item price; "TCG Low Price With Shipping" already includes
+# the buyer's shipping, so add any shipping allowance through floor_offset instead.
+DEFAULT_RULES = {
+    'market_multiplier': 0.95,
+    'floor': 'TCG Low Price',
+    'floor_offset': 0.0,
+    'minimum': 0.10,
+    'max_market_multiplier': 3.0,
+    'round_to': 0.01,
+    'rounding': 'up',
+    'rarity': {
+        'C': {'minimum': 0.25},
+        'UC': {'minimum': 0.25},
+        'SEC': {'market_multiplier': 1.0},
+        'L': {'market_multiplier': 1.0},
+    }
+}
+
+RULE_KEYS = ['market_multiplier', 'floor', 'floor_offset', 'minimum', 'max_market_multiplier',
+             'round_to', 'rounding']
+FLOOR_COLUMNS = ['TCG Low Price With Shipping', 'TCG Low Price', 'TCG Direct Low']
+ROUNDING_MODES = ['up', 'down', 'nearest']
+
+
+def load_rules(path):
+    """Read a rule set from a JSON file, filling missing keys from DEFAULT_RULES"""
+    with open(path) as f:
+        rules = json.load(f)
+
+    merged = {key: rules.get(key, DEFAULT_RULES[key]) for key in RULE_KEYS}
+    merged['rarity'] = rules.get('rarity', DEFAULT_RULES['rarity'])
+    return merged
+
+
+def rule_values(rarity, rules, key):
+    """
+    Expand one rule setting into a per-row array
+
+    Args:
+        rarity: Rarity column of the cards being priced
+        rules: Rule set
+        key: Setting to expand
+
+    Returns:
+        numpy array with the rarity override or the default for each row
+    """
+    overrides = {code: rule[key] for code, rule in rules.get('rarity', {}).items() if key in rule}
+    values = rarity.astype(object).map(overrides)
+    return values.where(values.notna(), rules[key]).to_numpy()
+
+
+def floor_prices(df, rules):
+    """Floor price for each row, taken from the floor column its rule selects"""
+    rarity = df['Rarity']
+
+    floor_names = rule_values(rarity, rules, 'floor')
+    unknown = set(floor_names) - set(FLOOR_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown floor column(s): {', '.join(sorted(map(str, unknown)))}")
+
+    floor = np.full(len(df), np.nan)
+    for col in FLOOR_COLUMNS:
+        selected = floor_names == col
+        if selected.any():
+            floor[selected] = df[col].to_numpy(dtype=float)[selected]
+
+    return floor + rule_values(rarity, rules, 'floor_offset').astype(float)
+
+
+def market_caps(df, rules):
+    """Highest allowed price for each row, NaN where there is no cap or no market price"""
+    market = df['TCG Market Price'].to_numpy(dtype=float)
+    max_market_multiplier = rule_values(df['Rarity'], rules, 'max_market_multiplier').astype(float)
+    return market * max_market_multiplier
+
+
+def capped_cards(df, rules):
+    """
+    Cards whose floor price is above the market cap
+
+    These are usually a single absurd lowest listing; reprice() caps them,
+    but they are worth a look before uploading.
+    """
+    return df[floor_prices(df, rules) > market_caps(df, rules)]
+
+
+def reprice(df, rules=DEFAULT_RULES):
+    """
+    Compute listing prices for every row in one vectorized pass
+
+    Args:
+        df: Cards with the TCG price columns and Rarity
+        rules: Rule set, see DEFAULT_RULES
+
+    Returns:
+        Series of listing prices aligned with df, NaN for cards with no
+        market or floor price
+    """
+    for key in RULE_KEYS:
+        if key not in rules:
+            raise ValueError(f"Rule set is missing '{key}'")
+
+    rarity = df['Rarity']
+    market = df['TCG Market Price'].to_numpy(dtype=float)
+    floor = floor_prices(df, rules)
+    cap = market_caps(df, rules)
+
+    market_multiplier = rule_values(rarity, rules, 'market_multiplier').astype(float)
+    minimum = rule_values(rarity, rules, 'minimum').astype(float)
+    round_to = rule_values(rarity, rules, 'round_to').astype(float)
+    rounding = rule_values(rarity, rules, 'rounding')
+
+    unknown = set(rounding) - set(ROUNDING_MODES)
+    if unknown:
+        raise ValueError(f"Unknown rounding mode(s): {', '.join(sorted(map(str, unknown)))}")
+    if not (np.isfinite(round_to) & (round_to > 0)).all():
+        raise ValueError("round_to must be a positive number")
+    if (cap < 0).any():
+        raise ValueError("max_market_multiplier must not be negative")
+
+    # fmax/fmin ignore NaN, so a missing market or floor price falls through to
+    # the other term and a missing cap means no cap. np.maximum keeps NaN, so
+    # minimum only raises prices that exist and unpriced cards stay NaN.
+    price = np.fmax(market * market_multiplier, floor)
+    price = np.fmin(price, cap)
+    price = np.maximum(price, minimum)
+
+    steps = price / round_to
+    # Small epsilon keeps float noise (e.g. 1.3200000001) from rounding up a whole step
+    steps = np.where(rounding == 'up', np.ceil(steps - 1e-9),
+                     np.where(rounding == 'down', np.floor(steps + 1e-9), np.round(steps)))
+    price = np.round(steps * round_to, 2)
+
+    return pd.Series(price, index=df.index, name='TCG Marketplace Price')
+
+
+def write_prices(engine, df):
+    """
+    Write listing prices back to the database in a single UPDATE
+
+    Cards without a listing price are left untouched.
+
+    Args:
+        engine: SQLAlchemy engine
+        df: Cards with TCGplayer Id and TCG Marketplace Price
+
+    Returns:
+        Number of rows updated
+    """
+    staging = df[['TCGplayer Id', 'TCG Marketplace Price']].dropna()
+    rows = [(int(card_id), float(price)) for card_id, price in staging.itertuples(index=False)]
+    if not rows:
+        return 0
+
+    with engine.begin() as conn:
+        # Session-local table, so concurrent runs each get their own staging rows
+        conn.execute(text(
+            'CREATE TEMP TABLE reprice_staging '
+            '("TCGplayer Id" bigint, "TCG Marketplace Price" double precision) ON COMMIT DROP'
+        ))
+        # Multi-row VALUES pages instead of one round trip per card
+        cursor = conn.connection.cursor()
+        execute_values(cursor, 'INSERT INTO reprice_staging VALUES %s', rows, page_size=1000)
+        cursor.close()
+        result = conn.execute(text(
+            f'UPDATE {TABLE_NAME} AS c SET "TCG Marketplace Price" = s."TCG Marketplace Price" '
+            'FROM reprice_staging AS s WHERE c."TCGplayer Id" = s."TCGplayer Id"'
+        ))
+
+    return result.rowcount
+
+
+def export_upload(df, output_file):
+    """
+    Write cards in the column layout TCGplayer expects for a pricing upload
+
+    Cards without a listing price are left out so they never go up for sale
+    at a placeholder price.
+
+    Returns:
+        Number of cards skipped
+    """
+    priced = df[df['TCG Marketplace Price'].notna()]
+    export_df = priced.reindex(columns=CATALOG_COLUMNS)
+    export_df.to_csv(output_file, index=False)
+    return len(df) - len(priced)
+
+
+def select_cards(args):
+    """Load the cards to reprice from an export or the catalog snapshot"""
+    if args.input:
+        return read_export(args.input)
+
+    filters = []
+    if args.set:
+        filters.append(('Set Name', 'in', args.set))
+    if args.rarity:
+        filters.append(('Rarity', 'in', args.rarity))
+    if args.number:
+        filters.append(('Number', 'in', args.number))
+
+    return load_catalog(args.catalog, filters=filters or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute listing prices and build a TCGplayer upload CSV')
+    parser.add_argument('--input', type=str, help='Reprice the cards in this export instead of the catalog')
+    parser.add_argument('--catalog', type=str, default='all_opc.csv', help='Catalog CSV (uses its snapshot)')
+    parser.add_argument('--set', type=str, nargs='+', help='Only reprice these set names')
+    parser.add_argument('--rarity', type=str, nargs='+', help='Only reprice these rarities')
+    parser.add_argument('--number', type=str, nargs='+', help='Only reprice these card numbers')
+    parser.add_argument('--rules', type=str, help='JSON rule set (defaults to DEFAULT_RULES)')
+    parser.add_argument('--output', type=str, help='Path for the upload CSV')
+    parser.add_argument('--write-db', action='store_true', help='Write the new prices to the database')
+    parser.add_argument('--only-added', action='store_true',
+                        help='Only keep cards with a non-zero Add to Quantity (e.g. a reviewed scan file)')
+
+    args = parser.parse_args()
+
+    try:
+        rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+        df = select_cards(args)
+        if args.only_added:
+            df = df[df['Add to Quantity'] > 0].reset_index(drop=True)
+        if df.empty:
+            raise ValueError("No cards matched the selection")
+
+        start = time.perf_counter()
+        df['TCG Marketplace Price'] = reprice(df, rules)
+        elapsed = time.perf_counter() - start
+        print(f"Repriced {len(df)} cards in {elapsed * 1000:.1f} ms")
+
+        capped = capped_cards(df, rules)
+        if not capped.empty:
+            print(f"Capped {len(capped)} cards whose lowest listing is far above market, e.g.:")
+            for name, number in capped[['Product Name', 'Number']].head(5).itertuples(index=False):
+                print(f"  {name} - {number}")
+
+        output_file = args.output
+        if output_file is None:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = f"reprice_{timestamp}.csv"
+        skipped = export_upload(df, output_file)
+        print(f"Upload file saved to {output_file}")
+        if skipped:
+            print(f"Skipped {skipped} cards with no market or floor price")
+
+        if args.write_db:
+            engine = create_engine(f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}')
+            count = write_prices(engine, df)
+            print(f"Updated TCG Marketplace Price for {count} records")
+
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+import os
+import re
+import csv
+import time
+import asyncio
+import argparse
+import datetime
+import difflib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from ocr import create_ocr, extract_from_image
+from reprice import DEFAULT_RULES, export_upload, load_rules, reprice
+from snapshot import CATALOG_COLUMNS, load_catalog
+
+# Database connection parameters
+DB_USER = 'postgres'
+DB_PASSWORD = 'postgres'
+DB_HOST = 'localhost'
+DB_PORT = '5432'
+DB_NAME = 'card_database'
+
+SUPPORTED_FORMATS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+
+# OCR output is noisy ("POP07-015SR", "ST21-0173", "0P07-015", "OPO7-015"), so pull
+# out the first thing shaped like a card number, allowing O and 0 to be swapped
+SET_NUMBER_PATTERN = re.compile(r'([O0]P|ST|EB|PRB)([\dO]{2})-?([\dO]{3})|(P)-?([\dO]{3})')
+
+# PaddleOCR instance owned by each process pool worker
+_worker_ocr = None
+
+
+def _init_ocr_worker():
+    global _worker_ocr
+    _worker_ocr = create_ocr()
+
+
+def _ocr_image(data):
+    # Decode here so only the compressed file bytes cross the process boundary
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    return extract_from_image(img, _worker_ocr)
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def normalize_number(text):
+    """
+    Turn OCR text from the set number region into a catalog card number
+
+    Returns:
+        Card number like "OP07-015", or None if nothing matched
+    """
+    if not text:
+        return None
+
+    match = SET_NUMBER_PATTERN.search(text.upper().replace(' ', ''))
+    if match is None:
+        return None
+    if match.group(1):
+        prefix = match.group(1).replace('0', 'O')
+        return f"{prefix}{match.group(2).replace('O', '0')}-{match.group(3).replace('O', '0')}"
+    return f"P-{match.group(5).replace('O', '0')}"
+
+
+def base_name(product_name):
+    """Product name without variant suffixes like "(051) (Alternate Art)" """
+    return re.sub(r'\s*\(.*?\)', '', product_name or '').strip()
+
+
+def pick_candidate(candidates, card_name):
+    """
+    Choose the catalog row that best matches the OCR card name
+
+    Ties go to the shortest product name, which is the base printing
+    rather than an alternate art or promo variant.
+    """
+    ocr_name = (card_name or '').lower().replace('.', ' ')
+
+    def score(product_name):
+        name = base_name(product_name).lower().replace('.', ' ')
+        return difflib.SequenceMatcher(None, ocr_name, name).ratio()
+
+    ranked = candidates.assign(
+        _score=candidates['Product Name'].map(score),
+        _length=candidates['Product Name'].str.len(),
+    ).sort_values(['_score', '_length'], ascending=[False, True])
+
+    return ranked.drop(columns=['_score', '_length']).iloc[0]
+
+
+class CatalogResolver:
+    """Resolve card numbers against the in-memory catalog snapshot"""
+
+    def __init__(self, catalog):
+        self.by_number = {number: group for number, group in catalog.groupby('Number')}
+
+    def candidates(self, number):
+        return self.by_number.get(number)
+
+    def close(self):
+        pass
+
+
+class DatabaseResolver:
+    """Resolve card numbers with the same query the web app uses, one connection per thread"""
+
+    def __init__(self):
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def get_connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = psycopg2.connect(
+                host=DB_HOST,
+                port=DB_PORT,
+                database=DB_NAME,
+                user=DB_USER,
+                password=DB_PASSWORD
+            )
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def candidates(self, number):
+        cursor = self.get_connection().cursor()
+        cursor.execute('SELECT * FROM one_piece_cards WHERE "Number" = %s', (number,))
+        rows = cursor.fetchall()
+        column_names = [desc[0] for desc in cursor.description]
+        cursor.close()
+
+        if not rows:
+            return None
+        return pd.DataFrame(rows, columns=column_names)
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+
+
+def resolve_card(resolver, filename, card_info):
+    """
+    Look up the catalog row for one OCR result
+
+    Returns:
+        Dictionary with the OCR fields, match status and the matched card (or None)
+    """
+    number = normalize_number(card_info['set_number'])
+    record = {
+        "image": filename,
+        "card_name": card_info['card_name'],
+        "set_number": card_info['set_number'],
+        "number": number,
+        "status": 'unresolved',
+        "card": None,
+        "candidates": None,
+        "candidate_rows": None,
+        "error": None,
+    }
+
+    if number is None:
+        return record
+
+    candidates = resolver.candidates(number)
+    if candidates is None or candidates.empty:
+        return record
+
+    # Several printings share a number (base, Alternate Art, Manga...) and OCR
+    # can't tell them apart, so the pick is only a suggestion for a person to confirm
+    record['card'] = pick_candidate(candidates, card_info['card_name'])
+    record['status'] = 'matched' if len(candidates) == 1 else 'ambiguous'
+    if record['status'] == 'ambiguous':
+        record['candidate_rows'] = candidates
+        record['candidates'] = '; '.join(
+            f"{card_id} {name}" for card_id, name in zip(candidates['TCGplayer Id'], candidates['Product Name'])
+        )
+    return record
+
+
+def error_record(filename, stage, error):
+    """Record for an image that failed in a pipeline stage"""
+    return {
+        "image": filename,
+        "card_name": None,
+        "set_number": None,
+        "number": None,
+        "status": 'error',
+        "card": None,
+        "candidates": None,
+        "candidate_rows": None,
+        "error": f"{stage}: {error}",
+    }
+
+
+class StageStats:
+    """Counters for one pipeline stage"""
+
+    def __init__(self, name, workers, queue):
+        self.name = name
+        self.workers = workers
+        self.queue = queue
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.max_depth = 0
+
+    def sample(self):
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def summary(self, elapsed):
+        rate = self.processed / elapsed if elapsed else 0.0
+        utilization = self.busy / (elapsed * self.workers) if elapsed else 0.0
+        return (f"{self.name:<8} workers {self.workers:>2}  processed {self.processed:>5}  "
+                f"errors {self.errors:>3}  {rate:7.2f} img/s  busy {utilization:6.1%}  "
+                f"max queue {self.max_depth}/{self.queue.maxsize}")
+
+
+async def run_stage(stats, inbox, outbox, handler, downstream_workers, errors=None):
+    """
+    Run a stage's workers until the upstream sends one None per worker
+
+    Each worker takes an item from inbox, awaits handler(item) and puts the
+    result on outbox. Items that fail are sent to the errors queue as an
+    error record so they still show up in the report. When every worker is
+    done, one None per downstream worker is sent so the next stage shuts
+    down the same way.
+    """
+    async def worker():
+        while True:
+            stats.sample()
+            item = await inbox.get()
+            if item is None:
+                break
+
+            start = time.perf_counter()
+            try:
+                result = await handler(item)
+            except Exception as e:
+                stats.errors += 1
+                print(f"  Error in {stats.name} for {item[0]}: {e}")
+                if errors is not None:
+                    await errors.put((item[0], error_record(item[0], stats.name, e)))
+                continue
+            finally:
+                stats.busy += time.perf_counter() - start
+
+            stats.processed += 1
+            if outbox is not None:
+                await outbox.put(result)
+
+    await asyncio.gather(*(worker() for _ in range(stats.workers)))
+
+    if outbox is not None:
+        for _ in range(downstream_workers):
+            await outbox.put(None)
+
+
+async def monitor(stages, start, interval):
+    """Print per-stage progress and queue depths every interval seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        for stats in stages:
+            stats.sample()
+        elapsed = time.perf_counter() - start
+        progress = ' | '.join(
+            f"{s.name} {s.processed} (q {s.queue.qsize()}/{s.queue.maxsize})" for s in stages
+        )
+        print(f"[{elapsed:6.1f}s] {progress}")
+
+
+async def scan(image_paths, resolver, args):
+    """
+    Stream images through read, OCR, resolve and export stages
+
+    Returns:
+        List of resolve records in completion order
+    """
+    loop = asyncio.get_running_loop()
+
+    read_queue = asyncio.Queue(maxsize=args.queue_size)
+    ocr_queue = asyncio.Queue(maxsize=args.queue_size)
+    resolve_queue = asyncio.Queue(maxsize=args.queue_size)
+    export_queue = asyncio.Queue(maxsize=args.queue_size)
+
+    read_stats = StageStats('read', args.read_workers, read_queue)
+    ocr_stats = StageStats('ocr', args.ocr_workers, ocr_queue)
+    resolve_stats = StageStats('resolve', args.resolve_workers, resolve_queue)
+    export_stats = StageStats('export', 1, export_queue)
+    stages = [read_stats, ocr_stats, resolve_stats, export_stats]
+
+    records = []
+
+    report = open(args.report, 'w', newline='')
+    writer = csv.writer(report)
+    writer.writerow(["Image", "Card Name", "Set Number", "Number", "TCGplayer Id", "Product Name",
+                     "Status", "Candidates", "Error"])
+
+    async def read(item):
+        filename, image_path = item
+        data = await loop.run_in_executor(threads, _read_file, image_path)
+        return filename, data
+
+    async def run_ocr(item):
+        filename, data = item
+        card_info = await loop.run_in_executor(pool, _ocr_image, data)
+        return filename, card_info
+
+    async def resolve(item):
+        filename, card_info = item
+        return filename, await loop.run_in_executor(threads, resolve_card, resolver, filename, card_info)
+
+    async def export(item):
+        filename, record = item
+        card = record['card']
+        records.append(record)
+        writer.writerow([
+            filename,
+            record['card_name'] or 'N/A',
+            record['set_number'] or 'N/A',
+            record['number'] or 'N/A',
+            card['TCGplayer Id'] if card is not None else '',
+            card['Product Name'] if card is not None else '',
+            record['status'],
+            record['candidates'] or '',
+            record['error'] or '',
+        ])
+
+    async def produce():
+        for image_path in image_paths:
+            await read_queue.put((os.path.basename(image_path), image_path))
+        for _ in range(args.read_workers):
+            await read_queue.put(None)
+
+    start = time.perf_counter()
+    monitor_task = asyncio.create_task(monitor(stages, start, args.interval))
+
+    threads = ThreadPoolExecutor(max_workers=args.read_workers + args.resolve_workers)
+    pool = ProcessPoolExecutor(max_workers=args.ocr_workers, initializer=_init_ocr_worker)
+    with threads, pool:
+        try:
+            await asyncio.gather(
+                produce(),
+                run_stage(read_stats, read_queue, ocr_queue, read, args.ocr_workers, export_queue),
+                run_stage(ocr_stats, ocr_queue, resolve_queue, run_ocr, args.resolve_workers, export_queue),
+                run_stage(resolve_stats, resolve_queue, export_queue, resolve, 1, export_queue),
+                run_stage(export_stats, export_queue, None, export, 0),
+            )
+        finally:
+            monitor_task.cancel()
+            report.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nScanned {len(image_paths)} images in {elapsed:.1f}s")
+    for stats in stages:
+        print(f"  {stats.summary(elapsed)}")
+
+    return records
+
+
+def review_rows(records):
+    """
+    Upload-format rows for every candidate printing of the ambiguous scans
+
+    The suggested pick carries the scan count in Add to Quantity and the
+    other printings carry 0, so a reviewer only has to move quantities.
+    """
+    ambiguous = [record for record in records if record['status'] == 'ambiguous']
+    picks = pd.Series([record['card']['TCGplayer Id'] for record in ambiguous]).value_counts()
+
+    rows = pd.concat([record['candidate_rows'] for record in ambiguous], ignore_index=True)
+    rows = rows.drop_duplicates(subset='TCGplayer Id').sort_values(['Number', 'Product Name'])
+    rows['Add to Quantity'] = rows['TCGplayer Id'].map(picks).fillna(0).astype(int)
+    return rows.reset_index(drop=True)
+
+
+def find_images(directory):
+    """All supported image files in a directory, sorted by name"""
+    paths = []
+    for filename in sorted(os.listdir(directory)):
+        if os.path.splitext(filename)[1].lower() in SUPPORTED_FORMATS:
+            paths.append(os.path.join(directory, filename))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan card images straight into a TCGplayer upload CSV')
+    parser.add_argument('input', type=str, help='Directory of card images')
+    parser.add_argument('--catalog', type=str, default='all_opc.csv', help='Catalog CSV (uses its snapshot)')
+    parser.add_argument('--db', action='store_true', help='Resolve cards against the database instead of the snapshot')
+    parser.add_argument('--rules', type=str, help='JSON rule set for listing prices')
+    parser.add_argument('--output', type=str, help='Path for the upload CSV')
+    parser.add_argument('--report', type=str, help='Path for the per-image results CSV')
+    parser.add_argument('--review', type=str, help='Path for the upload-format CSV of ambiguous scans')
+    parser.add_argument('--read-workers', type=int, default=2, help='Threads reading image files')
+    parser.add_argument('--ocr-workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help='Processes running OCR')
+    parser.add_argument('--resolve-workers', type=int, default=2, help='Threads resolving cards')
+    parser.add_argument('--queue-size', type=int, default=8, help='Capacity of each queue between stages')
+    parser.add_argument('--interval', type=float, default=5.0, help='Seconds between progress reports')
+
+    args = parser.parse_args()
+
+    for name in ['read_workers', 'ocr_workers', 'resolve_workers', 'queue_size']:
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be at least 1")
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    args.output = args.output or f"scan_{timestamp}.csv"
+    args.report = args.report or f"scan_{timestamp}_report.csv"
+    args.review = args.review or f"scan_{timestamp}_review.csv"
+
+    resolver = None
+    try:
+        if not os.path.isdir(args.input):
+            raise ValueError(f"{args.input} is not a directory")
+
+        image_paths = find_images(args.input)
+        if not image_paths:
+            raise ValueError(f"No images found in {args.input}")
+
+        resolver = DatabaseResolver() if args.db else CatalogResolver(load_catalog(args.catalog))
+        records = asyncio.run(scan(image_paths, resolver, args))
+
+        # Only exact matches are listed; ambiguous ones wait in the report for review
+        cards = [record['card'] for record in records if record['status'] == 'matched']
+        ambiguous = sum(record['status'] == 'ambiguous' for record in records)
+        failed = sum(record['status'] == 'error' for record in records)
+        unresolved = len(records) - len(cards) - ambiguous
+        print(f"\nResolved {len(cards)} cards, {ambiguous} ambiguous (need review), "
+              f"{unresolved} unresolved including {failed} errors (see {args.report})")
+
+        rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+
+        if ambiguous:
+            review = review_rows(records)
+            review['TCG Marketplace Price'] = reprice(review, rules)
+            review.reindex(columns=CATALOG_COLUMNS).to_csv(args.review, index=False)
+            print(f"Ambiguous scans saved to {args.review}; move each Add to Quantity to the right "
+                  f"printing, then run: python reprice.py --input {args.review} --only-added")
+
+        if cards:
+            # One upload row per card, with Add to Quantity set to the number of scans
+            scanned = pd.DataFrame(cards).reset_index(drop=True)
+            counts = scanned.groupby('TCGplayer Id').size()
+            selected = scanned.drop_duplicates(subset='TCGplayer Id').reset_index(drop=True)
+            selected['Add to Quantity'] = selected['TCGplayer Id'].map(counts).astype(int)
+            selected['TCG Marketplace Price'] = reprice(selected, rules)
+            skipped = export_upload(selected, args.output)
+            print(f"Upload file saved to {args.output}")
+            if skipped:
+                print(f"Skipped {skipped} cards with no market or floor price")
+
+    except Exception as e:
+        print(f"Error: {e}")
+
+    finally:
+        if resolver is not None:
+            resolver.close()
+
+
+if __name__ == "__main__":
+    main()
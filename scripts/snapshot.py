@@ -0,0 +1,230 @@
+import os
+import json
+import argparse
+import tempfile
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Bump whenever the column layout or dtypes below change so stale snapshots get rebuilt
+SNAPSHOT_VERSION = 1
+VERSION_KEY = b'opc_snapshot'
+
+CATALOG_COLUMNS = [
+    "TCGplayer Id", "Product Line", "Set Name", "Product Name", "Title",
+    "Number", "Rarity", "Condition", "TCG Market Price", "TCG Direct Low",
+    "TCG Low Price With Shipping", "TCG Low Price", "Total Quantity",
+    "Add to Quantity", "TCG Marketplace Price", "Photo URL"
+]
+PRICE_COLUMNS = ['TCG Market Price', 'TCG Direct Low', 'TCG Low Price With Shipping',
+                 'TCG Low Price', 'TCG Marketplace Price']
+QUANTITY_COLUMNS = ['Total Quantity', 'Add to Quantity']
+# Low-cardinality columns stored dictionary encoded
+CATEGORY_COLUMNS = ['Product Line', 'Set Name', 'Rarity', 'Condition']
+
+
+def default_snapshot_path(csv_path):
+    """Snapshot file that sits next to the given CSV export"""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def read_export(csv_path):
+    """
+    Parse a TCGplayer CSV export into typed columns
+
+    Args:
+        csv_path: Path to a catalog or pricing export
+
+    Returns:
+        DataFrame with numeric price/quantity columns and stripped text
+    """
+    df = pd.read_csv(csv_path, dtype=str)
+
+    # Strip whitespace from text columns in one vectorized pass per column
+    for col in df.columns:
+        df[col] = df[col].str.strip()
+
+    df['TCGplayer Id'] = pd.to_numeric(df['TCGplayer Id'], errors='coerce').astype('Int64')
+
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    for col in QUANTITY_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+
+    return df
+
+
+def encode_categories(df):
+    """Convert the low-cardinality text columns to pandas categoricals"""
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def build_snapshot(csv_paths, output_path):
+    """
+    Combine catalog and price exports into a single Parquet snapshot
+
+    When the same TCGplayer Id appears more than once, the most recently
+    modified file wins, so re-downloading the catalog supersedes older
+    price exports.
+
+    Args:
+        csv_paths: List of CSV exports to combine
+        output_path: Where to write the snapshot
+
+    Returns:
+        The combined DataFrame
+    """
+    csv_paths = sorted(csv_paths, key=os.path.getmtime)
+    frames = [read_export(path) for path in csv_paths]
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset='TCGplayer Id', keep='last').reset_index(drop=True)
+    df = encode_categories(df)
+
+    stamp = {
+        'version': SNAPSHOT_VERSION,
+        'built_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'sources': {os.path.abspath(path): os.path.getmtime(path) for path in csv_paths},
+        'rows': len(df),
+    }
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[VERSION_KEY] = json.dumps(stamp).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    # Uncompressed so reads skip decompression; pages still have to be decoded
+    # into Arrow arrays, memory mapping only avoids copying the file into buffers
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix='.parquet.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, compression='none')
+        # Atomic swap so concurrent readers never see a half-written file
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    return df
+
+
+def read_stamp(snapshot_path):
+    """Return the version stamp stored in a snapshot, or None if it has none"""
+    metadata = pq.read_schema(snapshot_path).metadata or {}
+    if VERSION_KEY not in metadata:
+        return None
+    return json.loads(metadata[VERSION_KEY])
+
+
+def is_current(snapshot_path, csv_paths):
+    """Check that a snapshot exists, matches this version and is newer than its sources"""
+    if not os.path.exists(snapshot_path):
+        return False
+
+    stamp = read_stamp(snapshot_path)
+    if stamp is None or stamp['version'] != SNAPSHOT_VERSION:
+        return False
+
+    # A snapshot built from a different set of exports is stale too
+    if set(stamp['sources']) != {os.path.abspath(path) for path in csv_paths}:
+        return False
+
+    for path in csv_paths:
+        if os.path.getmtime(path) > stamp['sources'][os.path.abspath(path)]:
+            return False
+
+    return True
+
+
+def snapshot_sources(snapshot_path, csv_path):
+    """
+    Exports a snapshot should be built from
+
+    Keeps the price exports recorded in an existing snapshot alongside the
+    catalog, dropping any that no longer exist on disk. To drop an export
+    that still exists, rebuild with snapshot.py and leave it out.
+    """
+    sources = []
+    if os.path.exists(snapshot_path):
+        stamp = read_stamp(snapshot_path)
+        if stamp is not None:
+            sources = list(stamp['sources'])
+
+    catalog = os.path.abspath(csv_path)
+    if catalog not in sources:
+        sources.insert(0, catalog)
+
+    return [path for path in sources if os.path.exists(path)]
+
+
+def load_snapshot(snapshot_path, columns=None, filters=None):
+    """
+    Memory-map a snapshot and return it as a DataFrame
+
+    Args:
+        snapshot_path: Path to a snapshot written by build_snapshot
+        columns: Only load these columns (optional)
+        filters: Row filters in pyarrow form, e.g. [('Rarity', 'in', ['SR', 'SEC'])]
+
+    Returns:
+        DataFrame with categorical set, rarity and condition columns
+    """
+    stamp = read_stamp(snapshot_path)
+    if stamp is None or stamp['version'] != SNAPSHOT_VERSION:
+        raise ValueError(f"{snapshot_path} is not a version {SNAPSHOT_VERSION} snapshot, rebuild it with snapshot.py")
+
+    table = pq.read_table(snapshot_path, columns=columns, filters=filters, memory_map=True)
+    return table.to_pandas()
+
+
+def load_catalog(csv_path, snapshot_path=None, columns=None, filters=None):
+    """
+    Load the card catalog, using the snapshot when it is up to date
+
+    Rebuilds the snapshot from the catalog and any price exports it was
+    built with when it is missing or older than one of them.
+    """
+    if snapshot_path is None:
+        snapshot_path = default_snapshot_path(csv_path)
+
+    sources = snapshot_sources(snapshot_path, csv_path)
+    if not is_current(snapshot_path, sources):
+        build_snapshot(sources, snapshot_path)
+
+    return load_snapshot(snapshot_path, columns=columns, filters=filters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a typed Parquet snapshot of the card catalog')
+    parser.add_argument('inputs', type=str, nargs='*', default=['all_opc.csv'],
+                        help='Catalog and price exports (the newest file wins per TCGplayer Id)')
+    parser.add_argument('--output', type=str, help='Snapshot path (defaults to the first input with .parquet)')
+    parser.add_argument('--info', action='store_true', help='Print the stamp of an existing snapshot')
+
+    args = parser.parse_args()
+    output = args.output or default_snapshot_path(args.inputs[0])
+
+    try:
+        if args.info:
+            stamp = read_stamp(output)
+            if stamp is None:
+                raise ValueError(f"{output} has no snapshot stamp")
+            print(json.dumps(stamp, indent=2))
+            return
+
+        df = build_snapshot(args.inputs, output)
+        print(f"Wrote {len(df)} cards from {len(args.inputs)} export(s) to {output}")
+
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import pandas as pd
 import psycopg2
 from sqlalchemy import create_engine, text
+from snapshot import load_catalog
+from reprice import DEFAULT_RULES, reprice
 
 # Database connection parameters
 DB_USER = 'postgres'
@@ -9,21 +11,11 @@ DB_HOST = 'localhost'
 DB_PORT = '5432'
 DB_NAME = 'card_database'
 
-# Read the CSV file
-df = pd.read_csv('all_opc.csv')
+# Load the catalog from the Parquet snapshot, rebuilding it if the CSV is newer
+df = load_catalog('all_opc.csv')
 
-# Clean data
-df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-
-# Convert price columns to float
-price_columns = ['TCG Market Price', 'TCG Direct Low', 'TCG Low Price With Shipping', 'TCG Low Price']
-for col in price_columns:
-    df[col] = pd.to_numeric(df[col], errors='coerce')
-
-# Convert quantity columns to integer
-quantity_columns = ['Total Quantity', 'Add to Quantity']
-for col in quantity_columns:
-    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+# Compute listing prices from the TCG prices using the default rule set
+df['TCG Marketplace Price'] = reprice(df, DEFAULT_RULES)
 
 # Create SQLAlchemy engine
 engine = create_engine(f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}')
@@ -37,11 +29,6 @@ with engine.connect() as conn:
     result = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
     count = result.scalar()
     print(f"Successfully imported {count} records to PostgreSQL table '{table_name}'")
-    
-    # Execute the UPDATE statement
-    conn.execute(text('UPDATE one_piece_cards SET "TCG Marketplace Price" = 1'))
-    conn.commit()
-    print("\nUpdated TCG Marketplace Price to 1 for all records")
 
      # Show first few rows
     result = conn.execute(text(f"SELECT * FROM {table_name} LIMIT 5"))